@@ -5,5 +5,7 @@ module.exports = {
   mongodbUri: process.env.MONGO_URI,
   openaiApiKey: process.env.OPENAI_API_KEY,
   langChainApiKey: process.env.LANGCHAIN_API_KEY,
-  flaskBaseUrl: process.env.FLASK_BASE_URL
+  flaskBaseUrl: process.env.FLASK_BASE_URL,
+  // Streaming transcription service (rag_services/stream_app.py); defaults to the RAG service
+  flaskStreamUrl: process.env.FLASK_STREAM_URL || process.env.FLASK_BASE_URL
 };
@@ -6,10 +6,18 @@ from models.bert_training import BertEmbedder  # assumes bert_training.py is in
 device = torch.device("mps" if torch.backends.mps.is_available() else "cpu")
 
 class CustomBertEmbeddings(Embeddings):
-    def __init__(self, model_path="../models/bert4.pth"):
+    def __init__(self, model_path="../models/bert4.pth", mmap=False):
         self.model = BertEmbedder()
-        self.model.load_state_dict(torch.load(model_path, map_location=device))
-        self.model.to(device)
+        if mmap:
+            # Back the weights by the checkpoint file itself so every process
+            # that loads it shares the same page-cache pages (CPU only).
+            state_dict = torch.load(model_path, map_location="cpu", mmap=True)
+            self.model.load_state_dict(state_dict, assign=True)
+            if device.type != "cpu":
+                self.model.to(device)
+        else:
+            self.model.load_state_dict(torch.load(model_path, map_location=device))
+            self.model.to(device)
         self.model.eval()
 
     @torch.no_grad()
@@ -1,10 +1,15 @@
-from rag_chain import final_rag_chain1, final_rag_chain2, filtering_chain, refresh_vectorstore
+from rag_chain import final_rag_chain1, final_rag_chain2, filtering_chain, refresh_vectorstore, answer_batch, retrieve_batch
 import rag_chain  # Import module to access mutable retriever
-from flask import Flask, request, jsonify, send_file
+import metrics
+from metrics import log_event, timed
+from streaming import init_streaming, streaming
+from transcription import get_transcriber
+from flask import Flask, Response, g, request, jsonify, send_file
 from flask_cors import CORS
 from elevenlabs import ElevenLabs
 import openai
 import tempfile
+import time
 import os
 
 app = Flask(__name__)
@@ -12,13 +17,41 @@ CORS(app)
 
 client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 elevenlabs_client = ElevenLabs(api_key=os.getenv("ELEVENLABS_API_KEY"))
+transcriber = get_transcriber(client)
+
+# Streaming transcription routes; with several workers run stream_app.py instead
+init_streaming(transcriber)
+app.register_blueprint(streaming)
+
+# Batch query configuration. A batch runs in roughly
+# MAX_BATCH_SIZE / LLM_MAX_CONCURRENCY rounds of LLM calls and must finish
+# within the gunicorn worker timeout (RAG_TIMEOUT), so raise both together.
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "32"))
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    start = g.pop("request_start", None)
+    if start is not None and request.endpoint != "metrics_endpoint":
+        elapsed = time.perf_counter() - start
+        metrics.observe("request_latency_seconds", elapsed, endpoint=request.endpoint or "unknown")
+        metrics.inc("requests_total", endpoint=request.endpoint or "unknown", status=response.status_code)
+    return response
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Expose stage latencies, token counts and request counters for Prometheus."""
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
 
 @app.route("/query", methods=["POST"])
 def query():
     question = request.json.get("question")
     try:
         working = filtering_chain.invoke({"question": question})
-        print (working)
+        log_event("Filtering result: %s" % working)
         if working == "1":
             answer = final_rag_chain2.invoke({"question": question})
         else:
@@ -35,15 +68,13 @@ def process_audio():
     audio_file = request.files['audio']
 
     with tempfile.NamedTemporaryFile(delete=False, suffix=".webm") as temp_audio:
-        audio_file.save(temp_audio.name)
+        with timed("audio_save"):
+            audio_file.save(temp_audio.name)
 
         try:
-            with open(temp_audio.name, "rb") as file:
-                transcript = client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=file
-                )
-            return jsonify({'transcription': transcript.text})
+            with open(temp_audio.name, "rb") as file, timed("transcribe"):
+                transcription = transcriber.transcribe_file(file)
+            return jsonify({'transcription': transcription})
         except Exception as e:
             return jsonify({'error': str(e)}), 500
         finally:
@@ -60,15 +91,16 @@ def text_to_speech():
             return jsonify({'error': 'No text provided'}), 400
         
         # Use ElevenLabs client to convert text to speech
-        audio = elevenlabs_client.text_to_speech.convert(
-            voice_id="vDIugAdS5Kvhnm7nVYQ7",
-            text=text,
-            model_id="eleven_multilingual_v2",
-            output_format="mp3_44100_128",
-        )
+        with timed("tts_request"):
+            audio = elevenlabs_client.text_to_speech.convert(
+                voice_id="vDIugAdS5Kvhnm7nVYQ7",
+                text=text,
+                model_id="eleven_multilingual_v2",
+                output_format="mp3_44100_128",
+            )
         
-        # Save temporary audio file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as temp_audio:
+        # Save temporary audio file (the response body streams while iterating)
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as temp_audio, timed("tts_stream"):
             for chunk in audio:
                 temp_audio.write(chunk)
             temp_path = temp_audio.name
@@ -114,15 +146,71 @@ def get_retrieved_code():
     data = request.get_json()
     question = data.get("question", "")
     
-    if rag_chain.retriever is None:
-        return jsonify({"error": "No code documents loaded. Please upload code first."}), 400
-    
-    docs = rag_chain.retriever.invoke(question)
+    try:
+        if not rag_chain.index_ready():
+            return jsonify({"error": "No code documents loaded. Please upload code first."}), 400
+        
+        docs = rag_chain.retrieve(question)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
     top2 = docs[:5]
     return jsonify([
         {"content": doc.page_content, "metadata": doc.metadata}
         for doc in top2
     ])
 
+def parse_batch_questions():
+    """
+    Read the "questions" list of a batch request.
+    
+    Returns:
+        tuple: (questions, indices of valid questions, error response or None)
+    """
+    data = request.get_json(silent=True) or {}
+    questions = data.get("questions")
+    if not isinstance(questions, list) or not questions:
+        return None, None, (jsonify({"error": "'questions' must be a non-empty list"}), 400)
+    if len(questions) > MAX_BATCH_SIZE:
+        return None, None, (jsonify({"error": f"At most {MAX_BATCH_SIZE} questions per batch"}), 400)
+    valid = [i for i, q in enumerate(questions) if isinstance(q, str) and q.strip()]
+    return questions, valid, None
+
+@app.route("/query_batch", methods=["POST"])
+def query_batch():
+    """Answer a list of questions; results are in order with per-item errors."""
+    questions, valid, error = parse_batch_questions()
+    if error:
+        return error
+
+    results = [{"error": "Question must be a non-empty string"} for _ in questions]
+    try:
+        answers = answer_batch([questions[i] for i in valid])
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    for i, answer in zip(valid, answers):
+        results[i] = {"error": str(answer)} if isinstance(answer, Exception) else {"answer": answer}
+    return jsonify({"results": results})
+
+@app.route("/get_retrieved_code_batch", methods=["POST"])
+def get_retrieved_code_batch():
+    """Retrieve code for a list of questions with one batched embedding and search."""
+    questions, valid, error = parse_batch_questions()
+    if error:
+        return error
+
+    results = [{"error": "Question must be a non-empty string"} for _ in questions]
+    try:
+        if not rag_chain.index_ready():
+            return jsonify({"error": "No code documents loaded. Please upload code first."}), 400
+        batches = retrieve_batch([questions[i] for i in valid])
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    for i, docs in zip(valid, batches):
+        results[i] = {"documents": [
+            {"content": doc.page_content, "metadata": doc.metadata}
+            for doc in docs
+        ]}
+    return jsonify({"results": results})
+
 if __name__ == "__main__":
     app.run(debug=True, host='0.0.0.0', port=5001)
@@ -0,0 +1,120 @@
+"""
+Memory benchmark for running the RAG service with N worker processes.
+
+Compares two modes:
+  private - every worker loads its own CodeBERT weights and index copy
+            (what happens when each worker imports rag_chain on its own)
+  shared  - weights are memory-mapped and the index is a memory-mapped
+            SharedIndex generation, both loaded once before forking
+
+Reports total RSS and PSS (proportional set size, which splits shared pages
+between the processes mapping them) across the parent and all workers.
+Linux only, since it reads /proc/<pid>/smaps_rollup.
+
+Usage:
+    python bench_memory.py --workers 4 --docs 20000
+"""
+import argparse
+import gc
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, project_root)
+
+import numpy as np
+from langchain_core.documents import Document
+from models.custom_bert_embedder import CustomBertEmbeddings
+from shared_index import SharedIndex
+
+QUERY = "why does my binary search loop forever"
+
+
+def read_memory_kb(pid):
+    """Return (rss, pss) in kB for a process."""
+    rss = pss = 0
+    with open("/proc/%d/smaps_rollup" % pid) as f:
+        for line in f:
+            if line.startswith("Rss:"):
+                rss = int(line.split()[1])
+            elif line.startswith("Pss:"):
+                pss = int(line.split()[1])
+    return rss, pss
+
+
+def synthetic_index(num_docs, dim=256, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((num_docs, dim), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    docs = [Document(page_content="def f%d(): pass" % i, metadata={"file_name": "f%d.py" % i})
+            for i in range(num_docs)]
+    return docs, vectors
+
+
+def private_worker(args, ready, done):
+    embedder = CustomBertEmbeddings(model_path=args.model_path)
+    docs, vectors = synthetic_index(args.docs)
+    query = np.asarray(embedder.embed_query(QUERY), dtype=np.float32)
+    int(np.argmax(vectors @ query))
+    ready.put(os.getpid())
+    done.wait()
+
+
+def shared_worker(embedder, index, ready, done):
+    index.similarity_search(QUERY, k=5)
+    ready.put(os.getpid())
+    done.wait()
+
+
+def run(mode, args):
+    ctx = mp.get_context("fork")
+    ready, done = ctx.Queue(), ctx.Event()
+
+    if mode == "shared":
+        index_dir = tempfile.mkdtemp(prefix="ddd_index_")
+        embedder = CustomBertEmbeddings(model_path=args.model_path, mmap=True)
+        docs, vectors = synthetic_index(args.docs)
+        index = SharedIndex.build(index_dir, docs, vectors, embedder)
+        del docs, vectors
+        gc.collect()
+        gc.freeze()
+        target, target_args = shared_worker, (embedder, index, ready, done)
+    else:
+        target, target_args = private_worker, (args, ready, done)
+
+    procs = [ctx.Process(target=target, args=target_args) for _ in range(args.workers)]
+    for p in procs:
+        p.start()
+    pids = [ready.get() for _ in procs]
+
+    totals = [read_memory_kb(os.getpid())]
+    totals += [read_memory_kb(pid) for pid in pids]
+    done.set()
+    for p in procs:
+        p.join()
+    if mode == "shared":
+        gc.unfreeze()
+
+    rss = sum(t[0] for t in totals) / 1024
+    pss = sum(t[1] for t in totals) / 1024
+    print("%-8s workers=%d  total RSS=%8.1f MB  total PSS=%8.1f MB  PSS/worker=%7.1f MB"
+          % (mode, args.workers, rss, pss, pss / args.workers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--docs", type=int, default=20000, help="number of synthetic index vectors")
+    parser.add_argument("--model-path", default="../models/bert4.pth")
+    parser.add_argument("--mode", choices=["private", "shared", "both"], default="both")
+    args = parser.parse_args()
+
+    modes = ["private", "shared"] if args.mode == "both" else [args.mode]
+    for mode in modes:
+        run(mode, args)
+
+
+if __name__ == "__main__":
+    main()
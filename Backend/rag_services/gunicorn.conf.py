@@ -0,0 +1,54 @@
+# Multi-process deployment of the RAG service:
+#
+#   SHARED_INDEX_DIR=/tmp/ddd_index gunicorn -c gunicorn.conf.py app:app
+#
+# The CodeBERT weights are loaded once in the master and inherited by every
+# worker. With SHARED_INDEX_DIR set the weights are memory-mapped from the
+# checkpoint and /refresh publishes a new memory-mapped index generation that
+# all workers switch to.
+#
+# Nothing fork-unsafe runs in the master: Mongo queries, model inference and
+# the first index build are deferred to post_fork, where the first worker
+# builds the index and the others attach to it.
+import gc
+import os
+import shutil
+import tempfile
+
+bind = os.getenv("RAG_BIND", "0.0.0.0:5001")
+workers = int(os.getenv("RAG_WORKERS", "4"))
+timeout = int(os.getenv("RAG_TIMEOUT", "120"))
+torch_threads = int(os.getenv("RAG_TORCH_THREADS", str(max(1, (os.cpu_count() or 1) // workers))))
+preload_app = True
+
+# Read by rag_chain and metrics when the app is preloaded
+os.environ["RAG_DEFER_INIT"] = "1"
+os.environ.setdefault("METRICS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "ddd_metrics"))
+
+
+def on_starting(server):
+    # Start every deployment with fresh metrics
+    metrics_dir = os.environ["METRICS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+
+def when_ready(server):
+    # Move everything allocated while preloading out of the GC's reach so
+    # collections in the workers don't dirty the shared copy-on-write pages
+    gc.freeze()
+
+
+def child_exit(server, worker):
+    # Keep the exited worker's counters, drop its stale latency samples
+    import metrics
+
+    metrics.fold_exited_worker(worker.pid)
+
+
+def post_fork(server, worker):
+    import metrics
+    import rag_chain
+
+    rag_chain.init_worker(torch_threads=torch_threads)
+    metrics.start_snapshot_thread()
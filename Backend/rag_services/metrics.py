@@ -0,0 +1,382 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Metrics configuration
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+METRICS_JSON_LOGS = os.getenv("METRICS_JSON_LOGS", "false").lower() in ("1", "true", "yes")
+SAMPLE_WINDOW = 1024
+QUANTILES = (0.5, 0.95, 0.99)
+
+# With several worker processes each keeps its own metrics; when this is set,
+# workers write snapshots here and /metrics merges them (see gunicorn.conf.py)
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR")
+SNAPSHOT_INTERVAL_S = 5
+EXITED_SNAPSHOT = "metrics-exited.json"
+
+logger = logging.getLogger("duckduckdebug")
+if not logger.handlers:
+    _handler = logging.StreamHandler(sys.stdout)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_lock = threading.Lock()
+_samples = defaultdict(lambda: deque(maxlen=SAMPLE_WINDOW))
+_sample_counts = defaultdict(int)
+_sample_sums = defaultdict(float)
+_counters = defaultdict(float)
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+def observe(name, value, **labels):
+    """
+    Record one sample (e.g. a latency in seconds) for a summary metric.
+
+    Args:
+        name: Metric name
+        value: Observed value
+        **labels: Prometheus labels, e.g. stage="embed_query"
+    """
+    if not METRICS_ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _samples[key].append(value)
+        _sample_counts[key] += 1
+        _sample_sums[key] += value
+
+
+def inc(name, amount=1, **labels):
+    """
+    Increment a counter metric.
+
+    Args:
+        name: Metric name
+        amount: Amount to add
+        **labels: Prometheus labels
+    """
+    if not METRICS_ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] += amount
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_null_timer = _NullTimer()
+
+
+@contextmanager
+def _timer(stage, labels):
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except Exception:
+        status = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        observe("stage_latency_seconds", elapsed, stage=stage, **labels)
+        inc("stage_calls_total", stage=stage, status=status, **labels)
+        if METRICS_JSON_LOGS:
+            log_event("stage", stage=stage, status=status, seconds=round(elapsed, 6), **labels)
+
+
+def timed(stage, **labels):
+    """
+    Context manager that records the wall-clock time of a pipeline stage.
+
+    Returns a shared no-op context manager when metrics are disabled.
+
+    Args:
+        stage: Stage name, e.g. "embed_query" or "vector_search"
+        **labels: Extra Prometheus labels
+    """
+    if not METRICS_ENABLED:
+        return _null_timer
+    return _timer(stage, labels)
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callback that times prompt formatting and LLM calls of a chain
+    and counts LLM token usage, recorded as "<chain>_prompt" / "<chain>_llm".
+    """
+
+    def __init__(self, chain_name):
+        self.chain_name = chain_name
+        self._starts = {}
+
+    def on_chain_start(self, serialized, inputs, *, run_id, **kwargs):
+        if kwargs.get("run_type") == "prompt":
+            self._starts[run_id] = ("%s_prompt" % self.chain_name, time.perf_counter())
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._finish(run_id, "ok")
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, "error")
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._starts[run_id] = ("%s_llm" % self.chain_name, time.perf_counter())
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._starts[run_id] = ("%s_llm" % self.chain_name, time.perf_counter())
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        started = self._starts.get(run_id)
+        self._finish(run_id, "ok")
+        if started is None:
+            return
+        token_usage = (response.llm_output or {}).get("token_usage") or {}
+        inc("llm_tokens_total", token_usage.get("prompt_tokens", 0) or 0, stage=started[0], kind="input")
+        inc("llm_tokens_total", token_usage.get("completion_tokens", 0) or 0, stage=started[0], kind="output")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, "error")
+
+    def _finish(self, run_id, status):
+        started = self._starts.pop(run_id, None)
+        if started is None:
+            return
+        stage, start = started
+        elapsed = time.perf_counter() - start
+        observe("stage_latency_seconds", elapsed, stage=stage)
+        inc("stage_calls_total", stage=stage, status=status)
+        if METRICS_JSON_LOGS:
+            log_event("stage", stage=stage, status=status, seconds=round(elapsed, 6))
+
+
+def instrument(chain, chain_name):
+    """
+    Attach a MetricsCallbackHandler to a chain when metrics are enabled.
+
+    The chain itself is left unchanged, so there is no extra work or extra
+    trace runs when metrics are disabled.
+
+    Args:
+        chain: Runnable to instrument
+        chain_name: Prefix for the recorded stage names
+
+    Returns:
+        Runnable: The chain, bound to the metrics callback if enabled
+    """
+    if not METRICS_ENABLED:
+        return chain
+    return chain.with_config(callbacks=[MetricsCallbackHandler(chain_name)])
+
+
+def log_event(message, **fields):
+    """
+    Log a message, as a JSON object when METRICS_JSON_LOGS is set.
+
+    Args:
+        message: Human readable message
+        **fields: Structured fields attached to the event
+    """
+    if METRICS_JSON_LOGS:
+        logger.info(json.dumps({"ts": time.time(), "event": message, **fields}, default=str))
+    elif fields:
+        logger.info("%s %s", message, " ".join(f"{k}={v}" for k, v in fields.items()))
+    else:
+        logger.info(message)
+
+
+def _quantile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs)
+    return "{" + body + "}"
+
+
+def _snapshot():
+    with _lock:
+        return {
+            "samples": [[name, list(labels), list(values)] for (name, labels), values in _samples.items()],
+            "counts": [[name, list(labels), v] for (name, labels), v in _sample_counts.items()],
+            "sums": [[name, list(labels), v] for (name, labels), v in _sample_sums.items()],
+            "counters": [[name, list(labels), v] for (name, labels), v in _counters.items()],
+        }
+
+
+def write_snapshot():
+    """Write this process's metrics to METRICS_MULTIPROC_DIR."""
+    path = os.path.join(METRICS_MULTIPROC_DIR, "metrics-%d.json" % os.getpid())
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(_snapshot(), f)
+    os.replace(tmp, path)
+
+
+def start_snapshot_thread():
+    """
+    Periodically write snapshots so /metrics on any worker sees this one.
+
+    Call once per worker process after fork.
+    """
+    if not (METRICS_ENABLED and METRICS_MULTIPROC_DIR):
+        return
+
+    def loop():
+        while True:
+            time.sleep(SNAPSHOT_INTERVAL_S)
+            try:
+                write_snapshot()
+            except OSError as e:
+                log_event("Failed to write metrics snapshot", error=e)
+
+    threading.Thread(target=loop, daemon=True).start()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _snapshot_pid(name):
+    # "metrics-<pid>.json" -> pid, or None for the exited-workers aggregate
+    pid = name[len("metrics-"):-len(".json")]
+    return int(pid) if pid.isdigit() else None
+
+
+def fold_exited_worker(pid):
+    """
+    Fold an exited worker's counters into the exited-workers aggregate.
+
+    Its latency samples are dropped, so quantiles only cover live workers,
+    while counters, counts and sums keep growing monotonically. Call from
+    the gunicorn master (child_exit), which is the only writer of the
+    aggregate.
+
+    Args:
+        pid: Process id of the exited worker
+    """
+    if not METRICS_MULTIPROC_DIR:
+        return
+    path = os.path.join(METRICS_MULTIPROC_DIR, "metrics-%d.json" % pid)
+    aggregate_path = os.path.join(METRICS_MULTIPROC_DIR, EXITED_SNAPSHOT)
+    try:
+        with open(path) as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return
+
+    merged = {"samples": [], "counts": [], "sums": [], "counters": []}
+    try:
+        with open(aggregate_path) as f:
+            merged = json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    for section in ("counts", "sums", "counters"):
+        totals = defaultdict(float)
+        for snap in (merged, snapshot):
+            for metric, labels, value in snap[section]:
+                totals[(metric, tuple(tuple(pair) for pair in labels))] += value
+        merged[section] = [[metric, [list(pair) for pair in labels], v] for (metric, labels), v in totals.items()]
+    merged["samples"] = []
+
+    tmp = aggregate_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(merged, f)
+    os.replace(tmp, aggregate_path)
+    os.remove(path)
+
+
+def _collect():
+    """Return (samples, counts, sums, counters) for this process or all workers."""
+    if not METRICS_MULTIPROC_DIR:
+        with _lock:
+            return (
+                {key: list(values) for key, values in _samples.items()},
+                dict(_sample_counts), dict(_sample_sums), dict(_counters),
+            )
+
+    write_snapshot()
+    samples, counts, sums, counters = defaultdict(list), defaultdict(int), defaultdict(float), defaultdict(float)
+    targets = {"samples": samples, "counts": counts, "sums": sums, "counters": counters}
+    for name in os.listdir(METRICS_MULTIPROC_DIR):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(METRICS_MULTIPROC_DIR, name)) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        # Exited workers only contribute counters (so they never go
+        # backwards), not their stale latency samples
+        pid = _snapshot_pid(name)
+        sections = ["counts", "sums", "counters"]
+        if pid is not None and _pid_alive(pid):
+            sections.append("samples")
+        for section in sections:
+            for metric, labels, value in snapshot[section]:
+                targets[section][(metric, tuple(tuple(pair) for pair in labels))] += value
+    return samples, counts, sums, counters
+
+
+def render_prometheus():
+    """
+    Render all metrics in the Prometheus text exposition format.
+
+    Latency samples are exported as summaries whose quantiles are computed
+    over the most recent SAMPLE_WINDOW observations (per worker, merged
+    across live workers when METRICS_MULTIPROC_DIR is set).
+
+    Returns:
+        str: Metrics payload for a /metrics endpoint
+    """
+    raw_samples, counts, sums, counters = _collect()
+    samples = {key: sorted(values) for key, values in raw_samples.items()}
+
+    lines = []
+    seen = set()
+    for (name, labels), count in sorted(counts.items()):
+        if name not in seen:
+            lines.append(f"# TYPE {name} summary")
+            seen.add(name)
+        values = samples.get((name, labels))
+        if values:
+            for q in QUANTILES:
+                lines.append(f"{name}{_format_labels(labels, [('quantile', q)])} {_quantile(values, q)}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {sums[(name, labels)]}")
+        lines.append(f"{name}_count{_format_labels(labels)} {int(count)}")
+    for (name, labels), value in sorted(counters.items()):
+        if name not in seen:
+            lines.append(f"# TYPE {name} counter")
+            seen.add(name)
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
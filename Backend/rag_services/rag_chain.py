@@ -1,6 +1,7 @@
 import os
 import re
 import sys
+import time
 
 # Dynamically add the project root to sys.path (must be before local imports)
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -17,9 +18,12 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import Chroma
 from langchain_core.documents import Document
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.embeddings import Embeddings
 from langchain_core.runnables import RunnablePassthrough
 from langchain_openai import ChatOpenAI
 from models.custom_bert_embedder import CustomBertEmbeddings
+from metrics import instrument, log_event, timed
+from shared_index import SharedIndex, build_lock
 
 load_dotenv()
 
@@ -42,13 +46,49 @@ CHUNK_SIZE = 300
 CHUNK_OVERLAP = 50
 RETRIEVER_K = 5
 
-client = MongoClient(mongo_URI)
+# Batch query configuration
+EMBED_BATCH_SIZE = 64
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+# When set, the model weights are memory-mapped and the index is stored as
+# memory-mapped generations in this directory, shared by all worker processes
+SHARED_INDEX_DIR = os.getenv("SHARED_INDEX_DIR")
+
+# Set by gunicorn.conf.py: the preloading master only loads the model, and
+# Mongo queries, inference and the first index build happen in init_worker()
+# after fork (PyMongo clients and torch thread pools are not fork-safe)
+DEFER_INIT = os.getenv("RAG_DEFER_INIT", "false").lower() in ("1", "true", "yes")
+STARTUP_NS = time.time_ns()
+
+client = MongoClient(mongo_URI, connect=False)
 db = client["test"]
 collection = db["codes"]
 
+
+
+class TimedEmbeddings(Embeddings):
+    """Embeddings wrapper that records how long each embedding call takes."""
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+    def embed_documents(self, texts):
+        with timed("embed_documents"):
+            return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        with timed("embed_query"):
+            return self.embeddings.embed_query(text)
+
+    def embed_queries(self, texts):
+        """Embed several queries in one batched forward pass."""
+        with timed("embed_query_batch"):
+            return self.embeddings.embed_documents(texts)
+
+
 vectorstore = None
 retriever = None
-embedding_fn = CustomBertEmbeddings()
+embedding_fn = TimedEmbeddings(CustomBertEmbeddings(mmap=bool(SHARED_INDEX_DIR)))
 splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
     chunk_size=CHUNK_SIZE, 
     chunk_overlap=CHUNK_OVERLAP
@@ -153,33 +193,58 @@ def load_code_docs():
             metadata = clean_metadata(entry)
             code_docs.append(Document(page_content=content, metadata=metadata))
     
-    print("Document count:", collection.count_documents({}))
-    print("Loaded", len(code_docs), "function documents from MongoDB")
+    log_event("Document count: %d" % collection.count_documents({}))
+    log_event("Loaded %d function documents from MongoDB" % len(code_docs))
     return code_docs
 
 def refresh_vectorstore():
     """
     Refresh the vectorstore with current MongoDB documents.
     
-    Call this after code upload to update the RAG context.
+    Call this after code upload to update the RAG context. In shared mode
+    refreshes are serialized across workers with the index build lock, so
+    a refresh that read Mongo earlier can never publish over a newer one.
     
     Returns:
         bool: True if successful, False if no documents found
     """
+    if SHARED_INDEX_DIR:
+        with build_lock(SHARED_INDEX_DIR):
+            return _refresh_vectorstore()
+    return _refresh_vectorstore()
+
+
+def _refresh_vectorstore():
+    # Callers in shared mode must hold build_lock(SHARED_INDEX_DIR)
     global vectorstore, retriever
     
-    code_docs = load_code_docs()
+    with timed("mongo_load"):
+        code_docs = load_code_docs()
     
     if not code_docs:
-        print("No documents found in MongoDB. Vectorstore not initialized.")
-        vectorstore = None
-        retriever = None
+        log_event("No documents found in MongoDB. Vectorstore not initialized.")
+        if SHARED_INDEX_DIR:
+            # Publish an empty generation so other workers drop the old index too
+            vectorstore = SharedIndex.build(SHARED_INDEX_DIR, [], [], embedding_fn)
+            retriever = vectorstore.as_retriever(search_kwargs={"k": RETRIEVER_K})
+        else:
+            vectorstore = None
+            retriever = None
         return False
     
-    splits = splitter.split_documents(code_docs)
-    vectorstore = Chroma.from_documents(splits, embedding=embedding_fn)
+    with timed("split"):
+        splits = splitter.split_documents(code_docs)
+    # index_build includes the embed_documents time recorded by embedding_fn
+    with timed("index_build"):
+        if SHARED_INDEX_DIR:
+            embeddings = embedding_fn.embed_documents([doc.page_content for doc in splits])
+            vectorstore = SharedIndex.build(SHARED_INDEX_DIR, splits, embeddings, embedding_fn)
+            retriever = vectorstore.as_retriever(search_kwargs={"k": RETRIEVER_K})
+            log_event("Shared index generation %s built with %d chunks." % (vectorstore.generation, len(splits)))
+            return True
+        vectorstore = Chroma.from_documents(splits, embedding=embedding_fn)
     retriever = vectorstore.as_retriever(search_kwargs={"k": RETRIEVER_K})
-    print("Vectorstore refreshed successfully with", len(splits), "chunks.")
+    log_event("Vectorstore refreshed successfully with %d chunks." % len(splits))
     return True
 
 
@@ -195,10 +260,167 @@ def get_context(x):
     Returns:
         list or str: Retrieved documents or error message
     """
-    global retriever
-    if retriever is None:
+    if not index_ready():
         return "No code documents loaded yet."
-    return retriever.invoke(x["question"])
+    return retrieve(x["question"])
+
+
+def index_ready():
+    """
+    Check whether there are indexed documents to retrieve from.
+    
+    In shared mode another worker may have published a new generation since
+    this process last refreshed, so the shared index is consulted directly.
+    
+    Returns:
+        bool: True if retrieval can be performed
+    """
+    if SHARED_INDEX_DIR:
+        return vectorstore is not None and len(vectorstore) > 0
+    return retriever is not None
+
+
+def retrieve(question, k=RETRIEVER_K):
+    """
+    Embed a question and search the vectorstore, timing each step separately.
+    
+    Equivalent to retriever.invoke(question) for the default similarity search.
+    
+    Args:
+        question: Query string
+        k: Number of documents to return
+        
+    Returns:
+        list: Retrieved Document objects
+    """
+    query_vector = embedding_fn.embed_query(question)
+    with timed("vector_search"):
+        return vectorstore.similarity_search_by_vector(query_vector, k=k)
+
+
+def retrieve_batch(questions, k=RETRIEVER_K):
+    """
+    Embed many questions in batched forward passes and search for all of them at once.
+    
+    Args:
+        questions: List of query strings
+        k: Number of documents to return per question
+        
+    Returns:
+        list: One list of Document objects per question, in input order
+    """
+    if not questions:
+        return []
+
+    query_vectors = []
+    for i in range(0, len(questions), EMBED_BATCH_SIZE):
+        query_vectors.extend(embedding_fn.embed_queries(questions[i:i + EMBED_BATCH_SIZE]))
+
+    with timed("vector_search_batch"):
+        if SHARED_INDEX_DIR:
+            return vectorstore.similarity_search_by_vectors(query_vectors, k=k)
+        return chroma_search_by_vectors(vectorstore, query_vectors, k)
+
+
+def _batch_contexts(questions):
+    """
+    Retrieve contexts for answer_batch, isolating per-question failures.
+    
+    Args:
+        questions: List of query strings
+        
+    Returns:
+        list: Retrieved documents, a placeholder message, or an Exception per question
+    """
+    try:
+        if not index_ready():
+            return ["No code documents loaded yet."] * len(questions)
+        return retrieve_batch(questions)
+    except Exception as e:
+        log_event("Batched retrieval failed, retrying per question", error=e)
+
+    contexts = []
+    for question in questions:
+        try:
+            contexts.append(retrieve(question))
+        except Exception as e:
+            contexts.append(e)
+    return contexts
+
+
+def chroma_search_by_vectors(store, query_vectors, k):
+    """
+    Run one multi-query search against a Chroma vectorstore.
+    
+    The LangChain Chroma wrapper only searches one vector at a time, so this
+    goes through its underlying chromadb collection, whose query() accepts
+    many query embeddings at once. This is the only private access to it.
+    
+    Args:
+        store: LangChain Chroma vectorstore
+        query_vectors: Query embeddings, one per question
+        k: Number of documents to return per question
+        
+    Returns:
+        list: One list of Document objects per query, in input order
+    """
+    results = store._collection.query(
+        query_embeddings=query_vectors,
+        n_results=k,
+        include=["documents", "metadatas"],
+    )
+    return [
+        [Document(page_content=text, metadata=metadata or {}) for text, metadata in zip(texts, metadatas)]
+        for texts, metadatas in zip(results["documents"], results["metadatas"])
+    ]
+
+
+def answer_batch(questions, max_concurrency=LLM_MAX_CONCURRENCY):
+    """
+    Answer many questions, fanning out LLM calls with bounded concurrency.
+    
+    Retrieval for all debugging questions is done in one retrieve_batch call,
+    falling back to one retrieval per question if the batched call fails, so
+    a failure on one question does not affect the others.
+    
+    Args:
+        questions: List of query strings
+        max_concurrency: Maximum number of concurrent LLM calls per stage
+        
+    Returns:
+        list: One answer string or Exception per question, in input order
+    """
+    config = {"max_concurrency": max_concurrency}
+    results = filtering_chain.batch(
+        [{"question": q} for q in questions], config=config, return_exceptions=True
+    )
+
+    solved = [i for i, r in enumerate(results) if r == "1"]
+    debugging = [i for i, r in enumerate(results) if not isinstance(r, Exception) and r != "1"]
+
+    if solved:
+        answers = final_rag_chain2.batch(
+            [{"question": questions[i]} for i in solved], config=config, return_exceptions=True
+        )
+        for i, answer in zip(solved, answers):
+            results[i] = answer
+
+    if debugging:
+        contexts = _batch_contexts([questions[i] for i in debugging])
+        for i, c in zip(debugging, contexts):
+            if isinstance(c, Exception):
+                results[i] = c
+        inputs = [(i, c) for i, c in zip(debugging, contexts) if not isinstance(c, Exception)]
+        answers = debugging_answer_chain.batch(
+            [{"context": c, "question": questions[i]} for i, c in inputs],
+            config=config,
+            return_exceptions=True,
+        )
+        for (i, _), answer in zip(inputs, answers):
+            results[i] = answer
+
+    return results
+
 
 # =============================================================================
 # PROMPT TEMPLATES
@@ -243,34 +465,75 @@ llm = ChatOpenAI(temperature=0)
 
 # Filtering chain - determines if user has solved their issue
 filtering_prompt = ChatPromptTemplate.from_template(FILTERING_TEMPLATE)
-filtering_chain = (
+filtering_chain = instrument(
     itemgetter("question")
     | filtering_prompt
     | llm
-    | StrOutputParser()
+    | StrOutputParser(),
+    "filter",
 )
 
 # Debugging chain - provides rubber duck debugging assistance
 debugging_prompt = ChatPromptTemplate.from_template(DEBUGGING_TEMPLATE)
+debugging_answer_chain = instrument(
+    debugging_prompt
+    | llm
+    | StrOutputParser(),
+    "debug",
+)
 final_rag_chain1 = (
     {"context": get_context, "question": itemgetter("question")}
-    | debugging_prompt
-    | llm
-    | StrOutputParser()
+    | debugging_answer_chain
 )
 
 # Congratulation chain - celebrates when user solves the bug
 congratulation_prompt = ChatPromptTemplate.from_template(CONGRATULATION_TEMPLATE)
-final_rag_chain2 = (
+final_rag_chain2 = instrument(
     itemgetter("question")
     | congratulation_prompt
     | llm
-    | StrOutputParser()
+    | StrOutputParser(),
+    "congrats",
 )
 
 # =============================================================================
 # INITIALIZATION
 # =============================================================================
 
+def init_worker(torch_threads=None):
+    """
+    Finish initialization in a forked worker process.
+    
+    Recreates the Mongo client, limits torch intra-op threads, and attaches
+    to the shared index. In shared mode only the first worker to take the
+    build lock builds a generation; the others attach to it.
+    
+    Args:
+        torch_threads: Optional number of torch intra-op threads per worker
+    """
+    global client, db, collection, vectorstore, retriever
+    
+    if torch_threads:
+        torch.set_num_threads(torch_threads)
+    
+    client = MongoClient(mongo_URI)
+    db = client["test"]
+    collection = db["codes"]
+    
+    if not SHARED_INDEX_DIR:
+        refresh_vectorstore()
+        return
+    
+    with build_lock(SHARED_INDEX_DIR):
+        index = SharedIndex(SHARED_INDEX_DIR, embedding_fn)
+        if index.built_ns is not None and index.built_ns >= STARTUP_NS:
+            vectorstore = index
+            retriever = vectorstore.as_retriever(search_kwargs={"k": RETRIEVER_K})
+            log_event("Attached to shared index generation %s." % index.generation)
+        else:
+            _refresh_vectorstore()
+
+
 # Initialize vectorstore on module load (handles empty DB gracefully)
-refresh_vectorstore()
+if not DEFER_INIT:
+    refresh_vectorstore()
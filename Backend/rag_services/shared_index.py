@@ -0,0 +1,186 @@
+import fcntl
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+CURRENT_FILE = "CURRENT"
+VECTORS_FILE = "vectors.npy"
+DOCS_FILE = "docs.json"
+LOCK_FILE = ".build.lock"
+KEEP_GENERATIONS = 3
+RELOAD_ATTEMPTS = 3
+
+
+class SharedIndex(VectorStore):
+    """
+    Read-only vector index backed by memory-mapped files.
+
+    Every refresh writes a new generation directory and atomically swaps the
+    CURRENT pointer, so all worker processes map the same pages from the OS
+    page cache instead of each holding its own copy of the index. Workers
+    notice a new generation on their next search and switch to it.
+    """
+
+    def __init__(self, index_dir, embedding):
+        self.index_dir = index_dir
+        self._embedding = embedding
+        self._lock = threading.Lock()
+        self.generation = None
+        self.vectors = None
+        self.docs = []
+        self._maybe_reload()
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    @classmethod
+    def build(cls, index_dir, documents, vectors, embedding):
+        """
+        Write a new index generation and make it current.
+
+        Args:
+            index_dir: Directory shared by all workers
+            documents: List of LangChain Document objects
+            vectors: Embeddings for the documents, one row per document
+            embedding: Embeddings object used to embed queries
+
+        Returns:
+            SharedIndex: Index attached to the new generation
+        """
+        os.makedirs(index_dir, exist_ok=True)
+        generation = "gen-%d-%d" % (time.time_ns(), os.getpid())
+        gen_dir = os.path.join(index_dir, generation)
+        os.makedirs(gen_dir)
+
+        np.save(os.path.join(gen_dir, VECTORS_FILE), np.asarray(vectors, dtype=np.float32))
+        with open(os.path.join(gen_dir, DOCS_FILE), "w") as f:
+            json.dump([{"page_content": d.page_content, "metadata": d.metadata} for d in documents], f)
+
+        # Swap the pointer atomically so readers never see a half-written generation
+        tmp_pointer = os.path.join(index_dir, CURRENT_FILE + ".%d.tmp" % os.getpid())
+        with open(tmp_pointer, "w") as f:
+            f.write(generation)
+        os.replace(tmp_pointer, os.path.join(index_dir, CURRENT_FILE))
+
+        _remove_old_generations(index_dir, generation)
+        return cls(index_dir, embedding)
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, index_dir=None, **kwargs):
+        if index_dir is None:
+            raise ValueError("index_dir is required to build a SharedIndex")
+        metadatas = metadatas or [{} for _ in texts]
+        documents = [Document(page_content=t, metadata=m) for t, m in zip(texts, metadatas)]
+        return cls.build(index_dir, documents, embedding.embed_documents(list(texts)), embedding)
+
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        raise NotImplementedError("SharedIndex is read-only; build a new generation instead")
+
+    @property
+    def built_ns(self):
+        """Build time of the attached generation in ns since the epoch, or None."""
+        if self.generation is None:
+            return None
+        return int(self.generation.split("-")[1])
+
+    def _read_pointer(self):
+        try:
+            with open(os.path.join(self.index_dir, CURRENT_FILE)) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def _maybe_reload(self):
+        # The pointer is a few bytes, so compare its contents rather than its
+        # mtime, which can be identical for two swaps within one clock tick
+        generation = self._read_pointer()
+        if generation is None or generation == self.generation:
+            return
+
+        with self._lock:
+            for attempt in range(RELOAD_ATTEMPTS):
+                if generation is None or generation == self.generation:
+                    return
+                gen_dir = os.path.join(self.index_dir, generation)
+                try:
+                    vectors = np.load(os.path.join(gen_dir, VECTORS_FILE), mmap_mode="r")
+                    with open(os.path.join(gen_dir, DOCS_FILE)) as f:
+                        docs = [Document(**d) for d in json.load(f)]
+                except FileNotFoundError:
+                    # Removed by a newer refresh between reading CURRENT and loading it
+                    if attempt == RELOAD_ATTEMPTS - 1:
+                        raise
+                    generation = self._read_pointer()
+                    continue
+                self.vectors, self.docs, self.generation = vectors, docs, generation
+                return
+
+    def __len__(self):
+        self._maybe_reload()
+        return len(self.docs)
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return self.similarity_search_by_vectors([embedding], k=k)[0]
+
+    def similarity_search_by_vectors(self, embeddings, k=4):
+        """
+        Search for several query vectors with one matrix multiply.
+
+        Args:
+            embeddings: Query vectors, one per query
+            k: Number of documents to return per query
+
+        Returns:
+            list: One list of Document objects per query, in input order
+        """
+        self._maybe_reload()
+        vectors, docs = self.vectors, self.docs
+        if vectors is None or not len(docs) or not len(embeddings):
+            return [[] for _ in embeddings]
+
+        # Embeddings are L2-normalized, so the dot product ranks like cosine/L2 distance
+        scores = np.asarray(embeddings, dtype=np.float32) @ vectors.T
+        k = min(k, len(docs))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        return [[docs[i] for i in row] for row in top]
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return self.similarity_search_by_vector(self._embedding.embed_query(query), k=k)
+
+
+@contextmanager
+def build_lock(index_dir):
+    """
+    Hold an exclusive lock on the index directory across processes.
+
+    Args:
+        index_dir: Directory shared by all workers
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    with open(os.path.join(index_dir, LOCK_FILE), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _remove_old_generations(index_dir, current):
+    # Keep a couple of older generations around for workers still switching
+    # over; on POSIX, deleting files that are still mapped is safe anyway.
+    generations = sorted(
+        name for name in os.listdir(index_dir)
+        if name.startswith("gen-") and name != current
+    )
+    for name in generations[:max(0, len(generations) - (KEEP_GENERATIONS - 1))]:
+        shutil.rmtree(os.path.join(index_dir, name), ignore_errors=True)
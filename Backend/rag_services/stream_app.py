@@ -0,0 +1,29 @@
+# Dedicated process for streaming transcription.
+#
+# Streaming sessions are stateful (an ffmpeg subprocess per session), so when
+# app.py runs under several gunicorn workers, send /process_audio/stream/*
+# here instead (FLASK_STREAM_URL for the Express server). Run it as a single
+# process with threads, never with more than one worker:
+#
+#   gunicorn -w 1 --threads 16 -b 0.0.0.0:5002 stream_app:app
+#
+# It does not import rag_chain, so it doesn't load CodeBERT or touch Mongo.
+import metrics
+from flask import Flask, Response
+from flask_cors import CORS
+from streaming import init_streaming, streaming
+from transcription import get_transcriber
+
+app = Flask(__name__)
+CORS(app)
+
+init_streaming(get_transcriber())
+app.register_blueprint(streaming)
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Expose transcription stage latencies for Prometheus."""
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+if __name__ == "__main__":
+    app.run(host='0.0.0.0', port=5002, threaded=True)
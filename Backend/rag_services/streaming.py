@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+import uuid
+
+from flask import Blueprint, request, jsonify
+
+from metrics import log_event, timed
+from transcription import StreamingSession
+
+# Streaming transcription sessions hold an ffmpeg subprocess and decoder
+# thread, so they live in the process that created them. Under a
+# multi-worker server, serve these routes from one dedicated process
+# (stream_app.py) instead of the RAG workers.
+STREAM_SESSION_TTL_S = 300
+REAP_INTERVAL_S = 30
+
+streaming = Blueprint("streaming", __name__)
+
+transcriber = None
+stream_sessions = {}
+stream_sessions_lock = threading.Lock()
+_reaper_pid = None
+
+
+def init_streaming(session_transcriber):
+    """
+    Set the transcriber used by streaming sessions.
+
+    Args:
+        session_transcriber: Transcriber instance
+    """
+    global transcriber
+    transcriber = session_transcriber
+
+
+def purge_idle_sessions():
+    """Close streaming sessions the client abandoned."""
+    now = time.monotonic()
+    with stream_sessions_lock:
+        idle = [sid for sid, s in stream_sessions.items() if now - s.last_active > STREAM_SESSION_TTL_S]
+        sessions = [stream_sessions.pop(sid) for sid in idle]
+    for session in sessions:
+        session.close()
+    if sessions:
+        log_event("Closed idle streaming sessions", count=len(sessions))
+
+
+def _ensure_reaper():
+    # Started lazily (and once per process) so it also runs in forked workers
+    global _reaper_pid
+    with stream_sessions_lock:
+        if _reaper_pid == os.getpid():
+            return
+        _reaper_pid = os.getpid()
+
+    def loop():
+        while True:
+            time.sleep(REAP_INTERVAL_S)
+            purge_idle_sessions()
+
+    threading.Thread(target=loop, daemon=True).start()
+
+
+@streaming.route('/process_audio/stream', methods=['POST'])
+def start_audio_stream():
+    """Start a streaming transcription session."""
+    _ensure_reaper()
+    try:
+        session = StreamingSession(transcriber)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    session_id = uuid.uuid4().hex
+    with stream_sessions_lock:
+        stream_sessions[session_id] = session
+    return jsonify({'session_id': session_id})
+
+
+@streaming.route('/process_audio/stream/<session_id>', methods=['POST'])
+def stream_audio_chunk(session_id):
+    """Append an audio chunk and return the transcript of finished segments."""
+    with stream_sessions_lock:
+        session = stream_sessions.get(session_id)
+    if session is None:
+        return jsonify({'error': 'Unknown streaming session'}), 404
+
+    chunk = request.files['audio'].read() if 'audio' in request.files else request.get_data()
+    if not chunk:
+        return jsonify({'error': 'No audio chunk provided'}), 400
+
+    try:
+        session.feed(chunk)
+        partial, segments = session.partial()
+        return jsonify({'partial': partial, 'segments': segments})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@streaming.route('/process_audio/stream/<session_id>/finish', methods=['POST'])
+def finish_audio_stream(session_id):
+    """Flush the session and return the full transcript."""
+    with stream_sessions_lock:
+        session = stream_sessions.pop(session_id, None)
+    if session is None:
+        return jsonify({'error': 'Unknown streaming session'}), 404
+
+    try:
+        with timed("transcribe_stream_finish"):
+            transcription = session.finish()
+        return jsonify({'transcription': transcription})
+    except Exception as e:
+        session.close()
+        return jsonify({'error': str(e)}), 500
+
+
+@streaming.route('/process_audio/stream/<session_id>/cancel', methods=['POST'])
+def cancel_audio_stream(session_id):
+    """Abandon a session, stopping its decoder and pending transcriptions."""
+    with stream_sessions_lock:
+        session = stream_sessions.pop(session_id, None)
+    if session is None:
+        return jsonify({'error': 'Unknown streaming session'}), 404
+
+    session.close()
+    return jsonify({'message': 'Streaming session cancelled.'})
@@ -0,0 +1,331 @@
+import io
+import os
+import subprocess
+import threading
+import time
+import wave
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from metrics import log_event, timed
+
+# Transcription configuration
+TRANSCRIBER = os.getenv("TRANSCRIBER", "openai")  # "openai" or "local"
+LOCAL_WHISPER_MODEL = os.getenv("LOCAL_WHISPER_MODEL", "base.en")
+TRANSCRIBE_CONCURRENCY = int(os.getenv("TRANSCRIBE_CONCURRENCY", "4"))
+
+# Voice activity detection configuration (16 kHz mono int16 PCM)
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+VAD_ENERGY_THRESHOLD = float(os.getenv("VAD_ENERGY_THRESHOLD", "300"))
+VAD_SILENCE_MS = int(os.getenv("VAD_SILENCE_MS", "500"))
+VAD_MIN_SPEECH_MS = 200
+VAD_PADDING_MS = 150
+VAD_MAX_SEGMENT_S = 15
+
+
+# =============================================================================
+# TRANSCRIBERS
+# =============================================================================
+
+class Transcriber(ABC):
+    """
+    Interface for speech-to-text backends.
+
+    Subclasses implement transcribe_file; transcribe_pcm defaults to wrapping
+    the samples in an in-memory WAV file.
+    """
+
+    @abstractmethod
+    def transcribe_file(self, file):
+        """
+        Transcribe an encoded audio file.
+
+        Args:
+            file: Open binary file (webm, wav, ...)
+
+        Returns:
+            str: Transcribed text
+        """
+
+    def transcribe_pcm(self, samples):
+        """
+        Transcribe raw audio.
+
+        Args:
+            samples: int16 numpy array of 16 kHz mono PCM
+
+        Returns:
+            str: Transcribed text
+        """
+        return self.transcribe_file(pcm_to_wav(samples))
+
+
+class OpenAITranscriber(Transcriber):
+    """Transcribe with the OpenAI Whisper API."""
+
+    def __init__(self, client=None, model="whisper-1"):
+        import openai
+        self.client = client or openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.model = model
+
+    def transcribe_file(self, file):
+        transcript = self.client.audio.transcriptions.create(model=self.model, file=file)
+        return transcript.text
+
+
+class LocalWhisperTranscriber(Transcriber):
+    """Transcribe offline on CPU with faster-whisper (optional dependency)."""
+
+    def __init__(self, model_size=LOCAL_WHISPER_MODEL, compute_type="int8"):
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError as e:
+            raise ImportError(
+                "TRANSCRIBER=local requires faster-whisper: pip install faster-whisper"
+            ) from e
+        self.model = WhisperModel(model_size, device="cpu", compute_type=compute_type)
+
+    def transcribe_file(self, file):
+        segments, _ = self.model.transcribe(file, vad_filter=True)
+        return " ".join(s.text.strip() for s in segments).strip()
+
+    def transcribe_pcm(self, samples):
+        # faster-whisper takes float32 samples in [-1, 1] directly
+        audio = samples.astype(np.float32) / 32768.0
+        segments, _ = self.model.transcribe(audio)
+        return " ".join(s.text.strip() for s in segments).strip()
+
+
+def get_transcriber(client=None):
+    """
+    Create the transcriber selected by the TRANSCRIBER environment variable.
+
+    Args:
+        client: Optional OpenAI client to reuse for the API transcriber
+
+    Returns:
+        Transcriber: Configured transcriber
+    """
+    if TRANSCRIBER == "local":
+        return LocalWhisperTranscriber()
+    if TRANSCRIBER == "openai":
+        return OpenAITranscriber(client)
+    raise ValueError("Unknown TRANSCRIBER %r (expected 'openai' or 'local')" % TRANSCRIBER)
+
+
+def pcm_to_wav(samples):
+    """
+    Wrap int16 PCM samples in an in-memory WAV file.
+
+    Args:
+        samples: int16 numpy array of 16 kHz mono PCM
+
+    Returns:
+        BytesIO: WAV file positioned at the start, named for upload
+    """
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes(samples.astype(np.int16).tobytes())
+    buf.seek(0)
+    buf.name = "segment.wav"
+    return buf
+
+
+# =============================================================================
+# STREAMING
+# =============================================================================
+
+class SilenceSegmenter:
+    """
+    Energy-based voice activity detection that cuts PCM into utterances.
+
+    A segment is emitted once speech is followed by VAD_SILENCE_MS of
+    silence, or when it reaches VAD_MAX_SEGMENT_S.
+    """
+
+    def __init__(self, on_segment):
+        self.on_segment = on_segment
+        self.frame_len = SAMPLE_RATE * FRAME_MS // 1000
+        self.silence_frames = VAD_SILENCE_MS // FRAME_MS
+        self.min_speech_frames = VAD_MIN_SPEECH_MS // FRAME_MS
+        self.padding_frames = VAD_PADDING_MS // FRAME_MS
+        self.max_frames = VAD_MAX_SEGMENT_S * 1000 // FRAME_MS
+        self._pending = np.empty(0, dtype=np.int16)
+        self._frames = []
+        self._speech_frames = 0
+        self._trailing_silence = 0
+
+    def feed(self, samples):
+        samples = np.concatenate([self._pending, samples])
+        n_frames = len(samples) // self.frame_len
+        self._pending = samples[n_frames * self.frame_len:]
+
+        for i in range(n_frames):
+            frame = samples[i * self.frame_len:(i + 1) * self.frame_len]
+            rms = np.sqrt(np.mean(frame.astype(np.float32) ** 2))
+            is_speech = rms >= VAD_ENERGY_THRESHOLD
+
+            if not self._speech_frames:
+                # Keep a little lead-in so the first syllable isn't clipped
+                self._frames.append(frame)
+                self._frames = self._frames[-self.padding_frames:]
+                if is_speech:
+                    self._speech_frames = 1
+                continue
+
+            self._frames.append(frame)
+            if is_speech:
+                self._speech_frames += 1
+                self._trailing_silence = 0
+            else:
+                self._trailing_silence += 1
+
+            if self._trailing_silence >= self.silence_frames or len(self._frames) >= self.max_frames:
+                self._emit()
+
+    def flush(self):
+        if len(self._pending):
+            self._frames.append(self._pending)
+            self._pending = np.empty(0, dtype=np.int16)
+        self._emit()
+
+    def _emit(self):
+        if self._speech_frames >= self.min_speech_frames:
+            keep = len(self._frames) - max(0, self._trailing_silence - self.padding_frames)
+            self.on_segment(np.concatenate(self._frames[:keep]))
+        self._frames = []
+        self._speech_frames = 0
+        self._trailing_silence = 0
+
+
+class FfmpegDecoder:
+    """
+    Decode a compressed audio stream (e.g. MediaRecorder webm/opus chunks)
+    to 16 kHz mono int16 PCM incrementally with an ffmpeg subprocess.
+    """
+
+    def __init__(self, on_pcm):
+        self.on_pcm = on_pcm
+        self.proc = subprocess.Popen(
+            ["ffmpeg", "-loglevel", "error", "-i", "pipe:0",
+             "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        )
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        leftover = b""
+        while True:
+            data = self.proc.stdout.read1(32000)
+            if not data:
+                break
+            data = leftover + data
+            usable = len(data) - len(data) % 2
+            leftover = data[usable:]
+            self.on_pcm(np.frombuffer(data[:usable], dtype=np.int16))
+
+    def write(self, chunk):
+        self.proc.stdin.write(chunk)
+        self.proc.stdin.flush()
+
+    def close(self):
+        try:
+            self.proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        self._reader.join()
+        self.proc.wait()
+
+    def kill(self):
+        """Stop decoding immediately, discarding any audio still buffered."""
+        self.proc.kill()
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+        self._reader.join()
+        self.proc.wait()
+
+
+_executor = ThreadPoolExecutor(max_workers=TRANSCRIBE_CONCURRENCY)
+
+
+class StreamingSession:
+    """
+    One streaming transcription: audio chunks in, ordered transcript out.
+
+    Chunks are decoded as they arrive, cut on silence, and each segment is
+    transcribed on a shared thread pool while the user is still talking.
+    """
+
+    def __init__(self, transcriber):
+        self.transcriber = transcriber
+        self.last_active = time.monotonic()
+        self._futures = []
+        self._closed = False
+        self._lock = threading.Lock()
+        self._segmenter = SilenceSegmenter(on_segment=self._submit)
+        self._decoder = FfmpegDecoder(on_pcm=self._segmenter.feed)
+
+    def _transcribe_segment(self, samples):
+        with timed("transcribe_segment"):
+            return self.transcriber.transcribe_pcm(samples)
+
+    def _submit(self, samples):
+        with self._lock:
+            # No new (possibly paid) transcriptions once the session is abandoned
+            if self._closed:
+                return
+            self._futures.append(_executor.submit(self._transcribe_segment, samples))
+
+    def feed(self, chunk):
+        """Append a chunk of the encoded audio stream."""
+        self.last_active = time.monotonic()
+        self._decoder.write(chunk)
+
+    def partial(self):
+        """
+        Return the transcript of the segments finished so far.
+
+        Returns:
+            tuple: (text of the leading completed segments, total segment count)
+        """
+        with self._lock:
+            futures = list(self._futures)
+        texts = []
+        for future in futures:
+            if not future.done() or future.exception() is not None:
+                break
+            texts.append(future.result())
+        return " ".join(t for t in texts if t), len(futures)
+
+    def finish(self):
+        """
+        Flush the stream and wait for every segment to be transcribed.
+
+        Returns:
+            str: Full transcript
+        """
+        self._decoder.close()
+        self._segmenter.flush()
+        with self._lock:
+            futures = list(self._futures)
+        texts = [future.result() for future in futures]
+        log_event("Streaming transcription finished", segments=len(futures))
+        return " ".join(t for t in texts if t)
+
+    def close(self):
+        """Abandon the session without waiting for buffered audio or pending segments."""
+        with self._lock:
+            self._closed = True
+            futures = list(self._futures)
+        self._decoder.kill()
+        for future in futures:
+            future.cancel()
@@ -8,6 +8,7 @@ const router = express.Router();
 const upload = multer({ storage: multer.memoryStorage() });
 
 const FLASK_BASE_URL = config.flaskBaseUrl;
+const FLASK_STREAM_URL = config.flaskStreamUrl;
 
 // Text-to-speech
 router.post('/tts', async (req, res) => {
@@ -61,4 +62,64 @@ router.post('/process', upload.single('audio'), async (req, res) => {
   }
 });
 
+// Start a streaming speech-to-text session
+router.post('/stream', async (req, res) => {
+  try {
+    const response = await axios.post(`${FLASK_STREAM_URL}/process_audio/stream`);
+    res.json(response.data);
+  } catch (error) {
+    console.error('Error in start-stream route:', error.message);
+    res.status(500).json({ error: 'Failed to start audio stream' });
+  }
+});
+
+// Send one recorded chunk; responds with the partial transcript so far
+router.post('/stream/:sessionId', upload.single('audio'), async (req, res) => {
+  try {
+    if (!req.file) {
+      return res.status(400).json({ error: 'No audio chunk provided' });
+    }
+
+    const formData = new FormData();
+    formData.append('audio', req.file.buffer, {
+      filename: req.file.originalname || 'chunk.webm',
+      contentType: req.file.mimetype
+    });
+
+    const { sessionId } = req.params;
+    const response = await axios.post(`${FLASK_STREAM_URL}/process_audio/stream/${sessionId}`, formData, {
+      headers: formData.getHeaders()
+    });
+
+    res.json(response.data);
+  } catch (error) {
+    console.error('Error in stream-chunk route:', error.message);
+    res.status(500).json({ error: 'Failed to process audio chunk' });
+  }
+});
+
+// Finish a streaming session and get the full transcript
+router.post('/stream/:sessionId/finish', async (req, res) => {
+  try {
+    const { sessionId } = req.params;
+    const response = await axios.post(`${FLASK_STREAM_URL}/process_audio/stream/${sessionId}/finish`);
+    res.json(response.data);
+  } catch (error) {
+    console.error('Error in finish-stream route:', error.message);
+    res.status(500).json({ error: 'Failed to finish audio stream' });
+  }
+});
+
+// Cancel a streaming session so the server releases it right away
+router.post('/stream/:sessionId/cancel', async (req, res) => {
+  try {
+    const { sessionId } = req.params;
+    const response = await axios.post(`${FLASK_STREAM_URL}/process_audio/stream/${sessionId}/cancel`);
+    res.json(response.data);
+  } catch (error) {
+    console.error('Error in cancel-stream route:', error.message);
+    res.status(500).json({ error: 'Failed to cancel audio stream' });
+  }
+});
+
 module.exports = router;
@@ -32,4 +32,30 @@ router.post('/retrieved-code', async (req, res) => {
   }
 });
 
+// Batch RAG query: answers are returned in order, with per-question errors
+router.post('/query-batch', async (req, res) => {
+  try {
+    const { questions } = req.body;
+    const response = await axios.post(`${FLASK_BASE_URL}/query_batch`, { questions });
+    res.json(response.data);
+  } catch (error) {
+    console.error('Error in query-batch route:', error.message);
+    const status = error.response ? error.response.status : 500;
+    res.status(status).json(error.response ? error.response.data : { error: 'Failed to get RAG responses' });
+  }
+});
+
+// Get retrieved code documents for a batch of questions
+router.post('/retrieved-code-batch', async (req, res) => {
+  try {
+    const { questions } = req.body;
+    const response = await axios.post(`${FLASK_BASE_URL}/get_retrieved_code_batch`, { questions });
+    res.json(response.data);
+  } catch (error) {
+    console.error('Error in retrieved-code-batch route:', error.message);
+    const status = error.response ? error.response.status : 500;
+    res.status(status).json(error.response ? error.response.data : { error: 'Failed to get retrieved code' });
+  }
+});
+
 module.exports = router;
\ No newline at end of file
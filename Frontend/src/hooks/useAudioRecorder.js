@@ -1,6 +1,12 @@
 import { useState, useRef, useCallback } from "react";
 
-const useAudioRecorder = ({ onRecordingComplete, onError }) => {
+const useAudioRecorder = ({
+  onRecordingComplete,
+  onError,
+  onStart,
+  onChunk,
+  chunkIntervalMs = 1000,
+}) => {
   const [isRecording, setIsRecording] = useState(false);
   const [mediaRecorder, setMediaRecorder] = useState(null);
   const audioChunksRef = useRef([]);
@@ -54,6 +60,9 @@ const useAudioRecorder = ({ onRecordingComplete, onError }) => {
 
       recorder.ondataavailable = (event) => {
         audioChunksRef.current.push(event.data);
+        if (onChunk && event.data.size > 0) {
+          onChunk(event.data);
+        }
       };
 
       recorder.onstop = async () => {
@@ -67,7 +76,15 @@ const useAudioRecorder = ({ onRecordingComplete, onError }) => {
         }
       };
 
-      recorder.start();
+      if (onStart) {
+        onStart();
+      }
+      // With onChunk, emit audio every chunkIntervalMs so it can be streamed
+      if (onChunk) {
+        recorder.start(chunkIntervalMs);
+      } else {
+        recorder.start();
+      }
       setMediaRecorder(recorder);
       setIsRecording(true);
       requestAnimationFrame(checkSilence);
@@ -77,7 +94,7 @@ const useAudioRecorder = ({ onRecordingComplete, onError }) => {
         onError("Microphone access denied or error");
       }
     }
-  }, [onRecordingComplete, onError]);
+  }, [onRecordingComplete, onError, onStart, onChunk, chunkIntervalMs]);
 
   const stopRecording = useCallback(() => {
     if (mediaRecorder && mediaRecorder.state === "recording") {
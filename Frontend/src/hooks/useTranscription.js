@@ -1,4 +1,4 @@
-import { useState, useCallback } from "react";
+import { useState, useCallback, useRef } from "react";
 
 const API_BASE_URL = "http://localhost:8000";
 
@@ -42,6 +42,77 @@ const useTranscription = () => {
     }
   }, []);
 
+  // Streaming transcription: chunks are sent in order through a promise queue
+  const streamQueueRef = useRef(null);
+  const streamSessionRef = useRef(null);
+
+  const startStream = useCallback(() => {
+    streamSessionRef.current = null;
+    streamQueueRef.current = fetch(`${API_BASE_URL}/api/audio/stream`, {
+      method: "POST",
+    })
+      .then((res) => res.json())
+      .then((data) => {
+        if (!data.session_id) {
+          throw new Error(data.error || "Failed to start audio stream");
+        }
+        streamSessionRef.current = data.session_id;
+      });
+    return streamQueueRef.current;
+  }, []);
+
+  const sendChunk = useCallback((chunk, { onPartial } = {}) => {
+    if (!streamQueueRef.current) return Promise.resolve();
+
+    streamQueueRef.current = streamQueueRef.current.then(async () => {
+      const formData = new FormData();
+      formData.append("audio", chunk, "chunk.webm");
+
+      const res = await fetch(
+        `${API_BASE_URL}/api/audio/stream/${streamSessionRef.current}`,
+        { method: "POST", body: formData }
+      );
+      const data = await res.json();
+      if (data.error) {
+        throw new Error(data.error);
+      }
+      if (onPartial && data.partial) {
+        onPartial(data.partial);
+      }
+    });
+    return streamQueueRef.current;
+  }, []);
+
+  const finishStream = useCallback(async () => {
+    const queue = streamQueueRef.current;
+    streamQueueRef.current = null;
+    if (!queue) {
+      throw new Error("No active audio stream");
+    }
+    try {
+      await queue;
+    } catch (err) {
+      // Release the server-side session (decoder process) right away
+      if (streamSessionRef.current) {
+        fetch(
+          `${API_BASE_URL}/api/audio/stream/${streamSessionRef.current}/cancel`,
+          { method: "POST" }
+        ).catch((cancelErr) => console.error("[STREAM ERROR]", cancelErr));
+      }
+      throw err;
+    }
+
+    const res = await fetch(
+      `${API_BASE_URL}/api/audio/stream/${streamSessionRef.current}/finish`,
+      { method: "POST" }
+    );
+    const data = await res.json();
+    if (data.transcription !== undefined) {
+      return data.transcription;
+    }
+    throw new Error(data.error || "Unknown transcription error");
+  }, []);
+
   const fetchRetrievedCode = useCallback(async (question) => {
     const res = await fetch(`${API_BASE_URL}/api/rag/retrieved-code`, {
       method: "POST",
@@ -136,6 +207,9 @@ const useTranscription = () => {
     bubbleText,
     setBubbleText,
     processAudio,
+    startStream,
+    sendChunk,
+    finishStream,
     sendTranscription,
   };
 };
@@ -18,13 +18,37 @@ const DebugPage = () => {
     bubbleText,
     setBubbleText,
     processAudio,
+    startStream,
+    sendChunk,
+    finishStream,
     sendTranscription,
   } = useTranscription();
 
+  const handleRecordingStart = useCallback(() => {
+    // Swallow here; finishStream surfaces the failure and we fall back
+    startStream().catch((err) => console.error("[STREAM ERROR]", err));
+  }, [startStream]);
+
+  const handleChunk = useCallback(
+    (chunk) => {
+      sendChunk(chunk, { onPartial: setInputText }).catch((err) =>
+        console.error("[STREAM ERROR]", err)
+      );
+    },
+    [sendChunk]
+  );
+
   const handleRecordingComplete = useCallback(
     async (audioBlob) => {
       try {
-        const transcription = await processAudio(audioBlob);
+        let transcription;
+        try {
+          transcription = await finishStream();
+        } catch (streamErr) {
+          // Fall back to uploading the whole recording
+          console.error("[STREAM ERROR]", streamErr);
+          transcription = await processAudio(audioBlob);
+        }
         if (transcription) {
           setInputText(transcription);
           await sendTranscription(transcription, {
@@ -41,7 +65,7 @@ const DebugPage = () => {
         setBubbleText("❌ Transcription error: " + err.message);
       }
     },
-    [processAudio, sendTranscription, setBubbleText]
+    [finishStream, processAudio, sendTranscription, setBubbleText]
   );
 
   const handleRecordingError = useCallback(
@@ -68,6 +92,8 @@ const DebugPage = () => {
   const { isRecording, toggleRecording } = useAudioRecorder({
     onRecordingComplete: handleRecordingComplete,
     onError: handleRecordingError,
+    onStart: handleRecordingStart,
+    onChunk: handleChunk,
   });
 
   useEffect(() => {